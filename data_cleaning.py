@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from data_extraction import DataExtractor
 import re
@@ -14,6 +15,7 @@ class DataCleaning:
     - clean_product_data: Cleans product data.
     - clean_orders_data: Cleans order data.
     - clean_sales_data: Cleans sales data.
+    - check_referential_integrity: Checks orders foreign keys against the dimension tables.
 
     Usage Example:
 
@@ -25,6 +27,15 @@ class DataCleaning:
     
     """
 
+    # maps each foreign key in orders_table to the dimension table it references
+    foreign_keys = {
+        'card_number': 'dim_card_details',
+        'date_uuid': 'dim_date_times',
+        'product_code': 'dim_products',
+        'store_code': 'dim_store_details',
+        'user_uuid': 'dim_users',
+    }
+
     def __init__(self):
         pass
         
@@ -278,6 +289,95 @@ class DataCleaning:
 
         return sales_data
 
+    def check_referential_integrity(self, orders_data: pd.DataFrame, dim_tables: dict, how: str = 'report'):
+
+        """
+        Checks the foreign keys of the orders data against the cleaned dimension tables before upload.
+
+        Builds a hash index of the keys in each dimension table
+        Checks each foreign key column of orders_data against its index in one vectorised pass
+        Reports, repairs or quarantines order rows whose keys have no match
+
+        Parameters:
+        - orders_data (DataFrame): The cleaned orders DataFrame.
+        - dim_tables (dict): Cleaned dimension DataFrames keyed by table name, e.g. {'dim_users': user_data_cleaned}.
+        - how (str): 'report' leaves orders_data unchanged,
+          'quarantine' removes orphan rows,
+          'repair' strips whitespace from orphan keys, and leading '?' from orphan card numbers, then quarantines rows that still do not match.
+          Null keys are not treated as orphans.
+
+        Returns:
+        tuple: The checked orders DataFrame, a DataFrame of orphan rows with an 'orphan_keys' column naming the failing keys,
+        and a Series counting the orphan keys in each foreign key column.
+        """
+
+        if how not in ('report', 'quarantine', 'repair'):
+            raise ValueError(f"how must be 'report', 'quarantine' or 'repair', not {how!r}")
+
+        # strips whitespace from keys, and the leading question marks clean_card_data removes from card_number
+        def normalise_keys(keys, column):
+            keys = key_strings(keys).str.strip()
+            return keys.str.lstrip('?') if column == 'card_number' else keys
+
+        # converts keys to strings, whole-number floats such as 111.0 become '111' rather than '111.0'
+        def key_strings(keys):
+            if pd.api.types.is_float_dtype(keys) and (keys.dropna() % 1 == 0).all():
+                keys = keys.astype('Int64')
+            return keys.astype(str)
+
+        # only repair writes to orders_data, so only repair pays for a copy
+        if how == 'repair':
+            orders_data = orders_data.copy()
+
+        orphan_masks = {}
+
+        for column, table_name in self.foreign_keys.items():
+            if table_name not in dim_tables:
+                continue
+
+            keys = orders_data[column]
+
+            # builds a hash index of the unique keys in the dimension table, always as strings
+            dim_keys = pd.Index(key_strings(dim_tables[table_name][column].dropna()).unique())
+
+            # checks every order key against the index in a single vectorised pass
+            orphans = ~keys.isin(dim_keys).to_numpy()
+
+            # null keys never match the index but are not orphans, so only the misses are checked for nulls
+            orphans[orphans] = keys[orphans].notna().to_numpy()
+
+            # rechecks the misses as strings, so int or float order keys still match
+            if orphans.any():
+                positions = np.flatnonzero(orphans)
+                orphans[positions[key_strings(keys[orphans]).isin(dim_keys).to_numpy()]] = False
+
+            if how == 'repair' and orphans.any():
+                repaired = normalise_keys(keys[orphans], column)
+                fixed = repaired.isin(dim_keys).to_numpy()
+                positions = np.flatnonzero(orphans)[fixed]
+                orders_data.iloc[positions, orders_data.columns.get_loc(column)] = repaired.to_numpy()[fixed]
+                orphans[positions] = False
+
+            orphan_masks[column] = orphans
+
+        orphan_frame = pd.DataFrame(orphan_masks, index=orders_data.index)
+        any_orphans = orphan_frame.any(axis=1).to_numpy()
+
+        # lists the failing keys for each orphan row
+        orphan_rows = orders_data[any_orphans].copy()
+        orphan_keys = np.full(len(orphan_rows), '', dtype=object)
+        for column in orphan_frame.columns:
+            orphan_keys = np.where(orphan_frame[column].to_numpy()[any_orphans], orphan_keys + column + ', ', orphan_keys)
+        orphan_rows['orphan_keys'] = pd.Series(orphan_keys, index=orphan_rows.index, dtype=object).str.rstrip(', ')
+
+        # counts the orphan keys found in each foreign key column
+        orphan_counts = orphan_frame.sum()
+
+        if how != 'report':
+            orders_data = orders_data[~any_orphans]
+
+        return orders_data, orphan_rows, orphan_counts
+
 
 
 if __name__ == '__main__':
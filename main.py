@@ -118,21 +118,44 @@ dbc.upload_to_db(s3data_cleaned, "dim_products")
 print(dbc.list_db_tables())
 
 
+# Extract data from URL
+sales_data = de.retrieve_data_from_url('https://data-handling-public.s3.eu-west-1.amazonaws.com/date_details.json')
+
+# Clean URL data
+sales_data_cleaned = dc.clean_sales_data(sales_data)
+
+# Upload to database
+dbc.upload_to_db(sales_data_cleaned, 'dim_date_times')
+
+
+
 # Extract data from RDS
 orders_table = de.read_rds_table('orders_table')
 
 # Clean RDS data
 orders_table_cleaned = dc.clean_orders_data(orders_table)
 
-# Upload to database
-dbc.upload_to_db(orders_table_cleaned, "orders_table")
+# Check orders foreign keys against the cleaned dimension tables, repairing keys where possible and quarantining orphan rows
+dim_tables = {
+    'dim_card_details': card_data_cleaned,
+    'dim_date_times': sales_data_cleaned,
+    'dim_products': s3data_cleaned,
+    'dim_store_details': stores_data_cleaned,
+    'dim_users': user_data_cleaned,
+    }
+orders_table_checked, orders_table_orphans, orphan_counts = dc.check_referential_integrity(orders_table_cleaned, dim_tables, how='repair')
 
+# Print orphan keys per foreign key column and the number of order rows held back
+print(orphan_counts)
+print(f"{len(orders_table_orphans)} order rows quarantined to orders_table_orphans")
 
-# Extract data from URL
-sales_data = de.retrieve_data_from_url('https://data-handling-public.s3.eu-west-1.amazonaws.com/date_details.json')
+# Stop before uploading orders if too many rows were quarantined, as that points to a key matching fault rather than bad orders
+max_orphan_rate = 0.01
+if len(orders_table_orphans) > max_orphan_rate * len(orders_table_cleaned):
+    raise ValueError(f"{len(orders_table_orphans)} of {len(orders_table_cleaned)} order rows have orphan keys, more than {max_orphan_rate:.0%}; check the dimension tables before uploading orders_table")
 
-# Clean URL data
-sales_data_cleaned = dc.clean_sales_data(sales_data)
+# Upload quarantined orders so they can be reviewed rather than lost
+dbc.upload_to_db(orders_table_orphans, "orders_table_orphans")
 
 # Upload to database
-dbc.upload_to_db(sales_data_cleaned, 'dim_date_times')
\ No newline at end of file
+dbc.upload_to_db(orders_table_checked, "orders_table")
\ No newline at end of file